@@ -15,9 +15,21 @@ if METACULUS_TOKEN is None:
 
 
 OPENAI_MODEL_SMART = os.getenv("OPENAI_MODEL")
+OPENAI_MODEL_CHEAP = os.getenv("OPENAI_MODEL_CHEAP", "gpt-4o-mini")
 LLM_TO_USE = os.getenv("LLM_TO_USE")
 LLM_MODEL_CONFIG = os.getenv("LLM_MODEL_CONFIG")
 TEXT_EMBEDDING_MODEL = "text-embedding-3-small" # TODO: Hacer ENV VAR
+HTML_PROCESSING_BUDGET_USD = float(os.getenv("HTML_PROCESSING_BUDGET_USD", "1.0"))
+# Local data (caches, vector store) lives in the repo's data directory, regardless of the working directory.
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(DATA_DIR, "langchain_cache.db"))
+HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", os.path.join(DATA_DIR, "http_cache.sqlite"))
+
+# HTTP status codes that signal a transient problem, worth retrying. Other 4xx errors are permanent.
+RETRYABLE_STATUS_CODES = frozenset([408, 409, 425, 429, 500, 502, 503, 504])
+# Subset that is safe to retry for requests that are billed (e.g. completion POSTs): they are sent back before
+# the request is processed. After a 500, 502 or 504 the completion may already have run (and been paid for).
+RETRYABLE_POST_STATUS_CODES = frozenset([429, 503])
 
 POST_PREDICTIONS = os.getenv("POST_PREDICTIONS")
 
@@ -33,8 +45,15 @@ logger_factory = LoggerFactory(
     logs_file_dir=LOGS_FILE_DIR,
     logs_file_name=LOGS_FILE_NAME)
 
-from src.openai_utils import make_proxied_ChatOpenAI_LLM
+from src.openai_utils import LazySQLiteCache, make_proxied_ChatOpenAI_LLM
 llm_smart = make_proxied_ChatOpenAI_LLM(temperature=0.1)
+# Cached LLMs answer identical prompts from a persistent cache instead of calling the API again.
+# The cache database is only created once it is first used.
+llm_cache = LazySQLiteCache(database_path=LLM_CACHE_PATH)
+# The client's own retries are disabled, since it also resends requests that timed out after being sent (and billed).
+# HtmlContentProcessor retries only the errors that are safe to retry.
+llm_smart_cached = make_proxied_ChatOpenAI_LLM(temperature=0.1, cache=llm_cache, max_retries=0)
+llm_cheap_cached = make_proxied_ChatOpenAI_LLM(model=OPENAI_MODEL_CHEAP, temperature=0.1, cache=llm_cache, max_retries=0)
 
 
 AUTH_HEADERS = {"headers": {"Authorization": f"Token {METACULUS_TOKEN}"}}
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from functools import cached_property
 from typing import Dict, Any, Optional
 
 @dataclass
@@ -7,6 +8,7 @@ class CompletionResponse:
     Dataclass that encapsulates the response from the OpenAI API.
 
     This class provides properties to access different parts of the response.
+    They are computed on first access and cached, since the response is not expected to change.
 
     Parameters
     ----------
@@ -15,19 +17,19 @@ class CompletionResponse:
     """
     response_json: Dict[str, Any]
 
-    @property
+    @cached_property
     def id(self) -> Optional[int]:
         return self.response_json.get('id')
 
-    @property
+    @cached_property
     def object(self) -> Optional[str]:
         return self.response_json.get('object')
 
-    @property
+    @cached_property
     def model(self) -> Optional[str]:
         return self.response_json.get('model')
 
-    @property
+    @cached_property
     def first_choice(self) -> Optional[Dict[str, Any]]:
         maybe_choices = self.response_json.get('choices')
         if maybe_choices is not None and len(maybe_choices) > 0:
@@ -35,42 +37,42 @@ class CompletionResponse:
         else:
             return None
 
-    @property
+    @cached_property
     def content(self) -> Optional[str]:
         try:
             return self.first_choice.get('message').get('content')
         except:
             return None
 
-    @property
+    @cached_property
     def finish_reason(self) -> Optional[str]:
         try:
             return self.first_choice.get('finish_reason')
         except:
             return None
 
-    @property
+    @cached_property
     def prompt_tokens(self) -> Optional[int]:
         try:
             return self.response_json.get('usage').get('prompt_tokens')
         except:
             return None
 
-    @property
+    @cached_property
     def completion_tokens(self) -> Optional[int]:
         try:
             return self.response_json.get('usage').get('completion_tokens')
         except:
             return None
 
-    @property
+    @cached_property
     def total_tokens(self) -> Optional[int]:
         try:
             return self.response_json.get('usage').get('total_tokens')
         except:
             return None
     
-    @property
+    @cached_property
     def tokens_all(self) -> Optional[int]:
         "A string with prompt_tokens, completion_tokens, total_tokens"
         return f"{self.prompt_tokens}, {self.completion_tokens}, {self.total_tokens}"
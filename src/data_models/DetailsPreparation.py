@@ -7,9 +7,11 @@ from src.config import OPENAI_MODEL_SMART, logger_factory
 from src.data_models.CompletionResponse import CompletionResponse
 from src.data_models.QuestionDetails import QuestionDetails
 
-from src.metaculus import get_all_question_details_from_ids, extract_questions
-from src.openai_utils import get_gpt_prediction_via_proxy
-from src.utils import try_to_find_and_eval_dict
+from src.metaculus import get_all_question_details_from_ids
+from src.openai_utils import get_gpt_prediction_via_proxy, gather_predictions
+from src.utils import parse_json_projected
+
+UNIFIED_DETAILS_KEYS = ("title", "background", "resolution_criteria", "fine_print")
 
 
 class DetailsPreparation:
@@ -83,20 +85,22 @@ class DetailsPreparation:
                 self.question_details_dict, self.question_ids)
             self.unification_response = get_gpt_prediction_via_proxy(
                 messages, model=OPENAI_MODEL_SMART)
-            try:
-                unified_details_dict = try_to_find_and_eval_dict(
-                    self.unification_response.content)
-                self.unified_details = unified_details_dict
-            except:
-                self.logger.error(f"Failed to parse the following detail unification content:\n```\n{
-                    self.unification_response.content}\n```\n")
-                raise ValueError("Failed to parse detail unification content.")
+            self._parse_unification_response()
+
+    def _parse_unification_response(self):
+        try:
+            unified_details_dict = parse_json_projected(
+                self.unification_response.content, UNIFIED_DETAILS_KEYS)
+            self.unified_details = unified_details_dict
+        except:
+            self.logger.error(f"Failed to parse the following detail unification content:\n```\n{
+                self.unification_response.content}\n```\n")
+            raise ValueError("Failed to parse detail unification content.")
 
     @property
     def concatenated_questions_str(self):
-        question_list = extract_questions(self.question_details_dict)
         formated_questions = [
-            f"- question_id={q_id}: {question_list[q_id]}" for q_id in self.question_ids]
+            f"- question_id={q_id}: {self.question_details_dict[q_id].title}" for q_id in self.question_ids]
         concatenated_questions = "\n".join(formated_questions)
         return f"Following are the questions that must be answered, preceded by their respective question IDs:\n{concatenated_questions}"
 
@@ -112,24 +116,42 @@ class DetailsPreparation:
         return apply_question_template_to_unification_json(self.concatenated_questions_str, self.unified_details)
 
 
-def make_messages_for_details_unification(question_details_dict: Dict[int, QuestionDetails], question_ids: Iterable[int]) -> List[Dict[str, str]]:
+async def afetch_detail_unification_responses(details_preparators: List[DetailsPreparation], max_concurrency: int = 8):
     """
-    Generates a prompt for unifying the details of similar questions.
+    Fetches the detail unification responses of several groups of questions concurrently.
 
-    Parameters:
-    - question_details_dict (Dict[int, QuestionDetails]): A dictionary where keys are question IDs and values are dictionaries containing question details.
-    - question_ids (Iterable[int]): An iterable of question IDs to be unified. It is assumed that all the questions in the iterable are indeed similar.
+    Equivalent to calling `fetch_detail_unification_response` on each DetailsPreparation, but the requests to the
+    OpenAI API are made concurrently. The instances whose details are already unified are skipped.
+    If a request fails, the rest are still processed, and the first error is raised at the end.
 
-    Returns:
-    - str: A formatted string containing the prompt for unifying the details of the specified questions.
+    Parameters:
+    - details_preparators (List[DetailsPreparation]): The instances to fetch the responses for.
+    - max_concurrency (int): Maximum number of concurrent requests.
     """
-
-    questions_details = [question_details_dict[q_id] for q_id in question_ids]
-    question_str_list = [make_question_str(
-        details) for details in questions_details]
-    user_message = "\n".join(question_str_list)
-
-    system_message = """
+    pending = [dp for dp in details_preparators if dp.unified_details is None]
+    list_of_messages = [make_messages_for_details_unification(dp.question_details_dict, dp.question_ids)
+                        for dp in pending]
+    responses = await gather_predictions(list_of_messages, model=OPENAI_MODEL_SMART, max_concurrency=max_concurrency)
+    _set_unification_responses(pending, responses)
+
+
+def _set_unification_responses(details_preparators: List[DetailsPreparation], responses: List):
+    errors = []
+    for details_preparator, response in zip(details_preparators, responses):
+        try:
+            if isinstance(response, BaseException):
+                raise response
+            details_preparator.unification_response = response
+            details_preparator._parse_unification_response()
+        except Exception as e:
+            details_preparator.logger.error(f"Failed to fetch the detail unification response for question IDs {
+                details_preparator.question_ids}: {e}")
+            errors.append(e)
+    if errors:
+        raise errors[0]
+
+
+UNIFICATION_SYSTEM_MESSAGE = """
 You will recieve a series of similar questions. Each question has it's own background information and resolution criteria, even though they might be very similar.
 
 Your task is to synthesize the information from all the questions in a group and provide a unified background and resolution criteria for the group.
@@ -148,51 +170,46 @@ Provide your answer in the following JSON format:
 }}
 """
 
-    messages = [
-        {"role": "system", "content": system_message},
-        {"role": "user", "content": user_message}
-    ]
-    return messages
-
 
-def make_question_str(question_details: QuestionDetails) -> str:
+def make_messages_for_details_unification(question_details_dict: Dict[int, QuestionDetails], question_ids: Iterable[int]) -> List[Dict[str, str]]:
     """
-    Given the question details, generates a string with the relevant information for the grouping task.
+    Generates a prompt for unifying the details of similar questions.
+
+    Parameters:
+    - question_details_dict (Dict[int, QuestionDetails]): A dictionary where keys are question IDs and values are dictionaries containing question details.
+    - question_ids (Iterable[int]): An iterable of question IDs to be unified. It is assumed that all the questions in the iterable are indeed similar.
+
+    Returns:
+    - str: A formatted string containing the prompt for unifying the details of the specified questions.
     """
 
-    QUESTION_TEMPLATE = """
-The following are the details of the question with ID {id}:
+    question_records = "\n\n".join([make_question_str(question_details_dict[q_id]) for q_id in question_ids])
+    user_message = f"{QUESTION_RECORDS_LEGEND}\n\n{question_records}"
 
-Title: "{title}"
+    messages = [
+        {"role": "system", "content": UNIFICATION_SYSTEM_MESSAGE},
+        {"role": "user", "content": user_message}
+    ]
+    return messages
 
-The Resolution Criteria for the question is:
-```
-{resolution_criteria}
-```
 
-The resolution has the following fine print:
-```
-{fine_print}
-```
+QUESTION_RECORDS_LEGEND = ("Each question is given as a record [Q<question ID>] with the fields: title=title; "
+                           "pub=date on which the background was provided; rc=resolution criteria; fp=fine print; "
+                           "bg=background information. Empty fields are omitted.")
 
-Some background information was provided (at {publish_time}), to give context to the question:
-```
-{background}
-```
 
-This is the end of the details of question {id}.
-"""
+def make_question_str(question_details: QuestionDetails) -> str:
+    """
+    Given the question details, generates a compact record with the relevant information for the unification task.
 
-    return QUESTION_TEMPLATE.format(
-        id=question_details.id,
-        title=question_details.title,
-        news_articles="no news_articles here",
-        # today=today,
-        publish_time=question_details.publish_date,
-        background=question_details.background,
-        resolution_criteria=question_details.resolution_criteria,
-        fine_print=question_details.fine_print,
-    )
+    The field names are abbreviated (see QUESTION_RECORDS_LEGEND, which should precede the records), and empty fields are left out.
+    """
+    fields = [("title", question_details.title),
+              ("pub", question_details.publish_date),
+              ("rc", question_details.resolution_criteria),
+              ("fp", question_details.fine_print),
+              ("bg", question_details.background)]
+    return f"[Q{question_details.id}] " + "; ".join(f"{name}={value}" for name, value in fields if value)
 
 
 def collapse_questions_into_str(question_ids: Iterable[int], question_details_dict: Dict[int, QuestionDetails]) -> str:
@@ -203,29 +220,15 @@ def collapse_questions_into_str(question_ids: Iterable[int], question_details_di
     """
     assert len(
         question_ids) > 0, "question_ids must contain at least 1 question ID"
-    question_list = extract_questions(question_details_dict)
     collapsed = "\n".join(
-        [f"- question_id={q_id}: {question_list[q_id]}" for q_id in question_ids])
+        [f"- question_id={q_id}: {question_details_dict[q_id].title}" for q_id in question_ids])
     return f"""
 Following are the questions that must be answered, preceded by their respective question IDs:
 {collapsed}
     """
 
 
-def apply_question_template_to_unification_json(question_str: str,
-                                                details_dict: Dict) -> str:
-    """
-    Generates a unified string with the details of the questions to be forecasted.
-    """
-
-    resolution = details_dict["resolution_criteria"]
-    fine_print = details_dict["fine_print"]
-    try:
-        background = details_dict["background"]
-    except:
-        background = details_dict["description"]
-
-    return f"""{question_str}
+UNIFIED_QUESTION_TEMPLATE = """{question_str}
 
 The Resolution Criteria is:
 ```
@@ -242,3 +245,22 @@ The following background information was provided to give some context to the qu
 {background}
 ```
 """
+
+
+def apply_question_template_to_unification_json(question_str: str,
+                                                details_dict: Dict) -> str:
+    """
+    Generates a unified string with the details of the questions to be forecasted.
+    """
+
+    resolution = details_dict["resolution_criteria"]
+    fine_print = details_dict["fine_print"]
+    try:
+        background = details_dict["background"]
+    except:
+        background = details_dict["description"]
+
+    return UNIFIED_QUESTION_TEMPLATE.format(question_str=question_str,
+                                            resolution=resolution,
+                                            fine_print=fine_print,
+                                            background=background)
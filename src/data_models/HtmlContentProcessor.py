@@ -1,19 +1,38 @@
 import json
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 
-import itertools
-from src.html_utils import fetch_html, extract_urls, clean_html
-from src.config import logger_factory, llm_smart
+import httpx
+import openai
+import tiktoken
+from src.html_utils import fetch_html, extract_urls, clean_html, simhash, hamming_distance, extract_keywords, compress_text
+from src.config import HTML_PROCESSING_BUDGET_USD, RETRYABLE_POST_STATUS_CODES, logger_factory, llm_smart_cached, llm_cheap_cached
 from src.data_models.DetailsPreparation import DetailsPreparation
-from src.openai_utils import make_proxied_ChatOpenAI_LLM
+from src.data_models.SemanticResponseCache import SemanticResponseCache
+from src.openai_utils import BudgetCallbackHandler
 
 from langchain import LLMChain
 from langchain.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableBranch, RunnableLambda
 from langchain_community.callbacks.manager import get_openai_callback
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
 
 
-
+MAX_CONCURRENCY = 10
+# Scraped texts longer than this (in estimated tokens) are compressed, keeping only the sentences most related to the question.
+COMPRESSED_TEXT_MAX_TOKENS = 8000
+# Scraped texts shorter than this (in estimated tokens) are processed by the cheap model.
+CHEAP_MODEL_MAX_TOKENS = 4000
+# Context window of the models used, minus a safety margin. Scraped texts are truncated so that the prompt fits in it.
+CONTEXT_WINDOW_TOKENS = 120_000
+# Tokens reserved for the instructions of the prompt.
+PROMPT_RESERVED_TOKENS = 1000
+# Maximum number of tokens the LLM may generate for each scraped text, to cap the cost of every call.
+MAX_RESPONSE_TOKENS = 2000
+# Scraped texts whose SimHash fingerprints differ in at most this many bits are considered duplicates.
+SIMHASH_MAX_DISTANCE = 3
 
 
 class HtmlContentProcessor:
@@ -22,21 +41,27 @@ class HtmlContentProcessor:
 
     This class performs the following steps:
     - Extracts URLs from the 'background' field of the DetailsPreparation object's unified details.
-    - For each URL:
-        - Fetches and cleans the HTML content.
-        - Applies an LLM call to extract important information.
+    - Fetches and cleans the HTML content of all URLs concurrently, compressing the texts that are too long.
+    - Drops the URLs whose content is a near-duplicate of another URL's content.
+    - Applies a batched LLM call to extract important information from each remaining URL.
 
     Parameters
     ----------
     details_preparation : DetailsPreparation
         The DetailsPreparation object containing the unified details from which to extract URLs.
+    semantic_cache : Optional[SemanticResponseCache], optional
+        Cache used to reuse the responses obtained for similar texts in previous runs. If None, every text is sent to the LLM.
+    budget_usd : float, optional
+        Maximum amount of USD to spend in LLM calls. Once exceeded, the remaining URLs are skipped.
 
     Attributes
     ----------
     details_preparation : DetailsPreparation
         The DetailsPreparation object provided.
     llm_responses : Dict[str, str]
-        Dictionary mapping each URL to the LLM's response.
+        Dictionary mapping each URL to the LLM's response. Duplicated URLs share the response of the original one.
+    budget_callback : BudgetCallbackHandler
+        Callback that tracks the cost of all the LLM calls made by this object, and enforces the budget.
 
     Methods
     -------
@@ -44,91 +69,203 @@ class HtmlContentProcessor:
         Runs the entire processing pipeline.
     """
 
-    def __init__(self, details_preparation: 'DetailsPreparation'):
+    def __init__(self, details_preparation: 'DetailsPreparation', semantic_cache: Optional[SemanticResponseCache] = None,
+                 budget_usd: float = HTML_PROCESSING_BUDGET_USD):
         self.logger = logger_factory.make_logger(name="HtmlContentProcessor")
         self.details_preparation = details_preparation
+        self.semantic_cache = semantic_cache
+        self.budget_callback = BudgetCallbackHandler(budget_usd)
         self.llm_responses: Dict[str, str] = {}
         self.question_details_str = self.details_preparation.make_details_str()
+        self.question_keywords = extract_keywords(self.question_details_str)
+        self.scraped_text_max_tokens = CONTEXT_WINDOW_TOKENS - max_tokens(self.question_details_str) - PROMPT_RESERVED_TOKENS
 
     def run(self):
         """
         Runs the entire processing pipeline:
         - Extract URLs from the background information.
-        - For each URL:
-            - Fetch and clean HTML content.
-            - Apply LLM to the cleaned text.
+        - Fetch, clean and compress the HTML content of every URL concurrently.
+        - Deduplicate the cleaned texts.
+        - Apply the LLM to all the unique texts in a single batch.
+
+        Errors are handled per URL: a URL that fails is logged and left out of `llm_responses`.
         """
         self.logger.debug("Starting processing pipeline.")
         urls = self.extract_urls_from_backgrounds()
-        for url in urls:
-            try:
-                self.logger.debug(f"Processing URL: {url}")
-                raw_html = fetch_html(url)
-                if raw_html:
-                    clean_text = clean_html(raw_html)
-                    llm_response = self.apply_llm_to_text(clean_text, url)
-                    self.llm_responses[url] = llm_response
-                else:
-                    self.logger.warning(f"No content fetched from URL: {url}")
-            except Exception as e:
-                self.logger.error(f"Error processing URL {url}: {e}")
+        scraped_texts = self.fetch_and_clean_urls(urls)
+        unique_texts, duplicated_urls = self.deduplicate_texts(scraped_texts)
+        self.llm_responses.update(self.apply_llm_to_texts(unique_texts))
+        for duplicated_url, original_url in duplicated_urls.items():
+            if original_url in self.llm_responses:
+                self.llm_responses[duplicated_url] = self.llm_responses[original_url]
+        self.logger.info(f"Accumulated OpenAI usage of HtmlContentProcessor: \n{self.budget_callback}\n")
         self.logger.debug("Processing pipeline completed.")
 
+    def fetch_and_clean_urls(self, urls: List[str]) -> Dict[str, str]:
+        """
+        Fetches and cleans the HTML content of the given URLs concurrently.
+
+        Texts longer than COMPRESSED_TEXT_MAX_TOKENS are compressed, keeping the sentences most related to the question.
+
+        Parameters
+        ----------
+        urls : List[str]
+            The URLs to fetch.
+
+        Returns
+        -------
+        Dict[str, str]
+            Dictionary mapping each successfully fetched URL to its cleaned text.
+        """
+        scraped_texts = {}
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+            futures = {url: executor.submit(self._fetch_and_clean_url, url) for url in urls}
+            for url, future in futures.items():
+                try:
+                    clean_text = future.result()
+                    if clean_text is not None:
+                        scraped_texts[url] = clean_text
+                except Exception as e:
+                    self.logger.error(f"Error processing URL {url}: {e}")
+        return scraped_texts
+
+    def deduplicate_texts(self, texts: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """
+        Separates the texts that are near-duplicates of a previous one, comparing their SimHash fingerprints.
+
+        Parameters
+        ----------
+        texts : Dict[str, str]
+            Dictionary mapping each URL to its cleaned text.
+
+        Returns
+        -------
+        Tuple[Dict[str, str], Dict[str, str]]
+            A dictionary with the unique texts (keyed by URL), and a dictionary mapping
+            each duplicated URL to the URL of the text it duplicates.
+        """
+        unique_texts = {}
+        duplicated_urls = {}
+        seen_fingerprints: List[Tuple[int, str]] = []
+        for url, text in texts.items():
+            fingerprint = simhash(text)
+            original_url = next((seen_url for seen_fingerprint, seen_url in seen_fingerprints
+                                 if hamming_distance(fingerprint, seen_fingerprint) <= SIMHASH_MAX_DISTANCE), None)
+            if original_url is None:
+                seen_fingerprints.append((fingerprint, url))
+                unique_texts[url] = text
+            else:
+                self.logger.debug(f"Content of URL {url} is a duplicate of {original_url}, skipping it.")
+                duplicated_urls[url] = original_url
+        return unique_texts, duplicated_urls
+
+    def _fetch_and_clean_url(self, url: str) -> Optional[str]:
+        self.logger.debug(f"Processing URL: {url}")
+        raw_html = fetch_html(url)
+        if not raw_html:
+            self.logger.warning(f"No content fetched from URL: {url}")
+            return None
+        clean_text = clean_html(raw_html)
+        if estimate_tokens(clean_text) > COMPRESSED_TEXT_MAX_TOKENS:
+            self.logger.debug(f"Compressing text from URL {url} ({len(clean_text)} characters).")
+            clean_text = compress_text(clean_text, self.question_keywords, max_chars=COMPRESSED_TEXT_MAX_TOKENS * 4)
+        return clean_text
+
     def extract_urls_from_backgrounds(self) -> List[str]:
         """
         Extracts URLs from the 'background' field of each QuestionDetails object in the question_details_dict attribute.
 
         This method iterates over all values in the `question_details_dict` attribute, extracts URLs from the `background`
-        field of each element using the `extract_urls` function, and removes duplicates.
+        field of each element using the `extract_urls` function, and removes duplicates keeping the first-seen order.
 
         Returns
         -------
         List[str]
-            A list of unique URLs extracted from all 'background' fields.
+            A list of unique URLs extracted from all 'background' fields, in order of appearance.
         """
-        nested_urls = [extract_urls(details.background) for details in self.details_preparation.question_details_dict.values()]
-        flattened_urls = list(itertools.chain.from_iterable(nested_urls))
-        unique_urls = list(set(flattened_urls))
-        return unique_urls
+        return list(dict.fromkeys(url
+                                  for details in self.details_preparation.question_details_dict.values()
+                                  for url in extract_urls(details.background or '')))
 
-    def apply_llm_to_text(self, text: str, url: str) -> str:
+    def apply_llm_to_texts(self, texts: Dict[str, str]) -> Dict[str, str]:
         """
-        Applies LLM call to the cleaned text to extract important information.
+        Applies the LLM call to several cleaned texts at once, running the requests concurrently.
 
         Parameters
         ----------
-        text : str
-            The cleaned text to be processed by the LLM.
-        url : str
-            The URL associated with the text, used in the prompt.
+        texts : Dict[str, str]
+            Dictionary mapping each URL to its cleaned text.
 
         Returns
         -------
-        str
-            The response from the LLM.
-
-        Raises
-        ------
-        Exception
-            If an error occurs during the LLM call.
-        """
-        try:
-            prompt_template = ChatPromptTemplate([("user", prompt_str)]) 
-            chain = prompt_template | llm_smart | StrOutputParser()
-            self.logger.debug(f"Sending LLM request for URL: {url}")
-            input_dict = {"question_details": self.question_details_str,
-                          "url": url,
-                          "scraped_text": text,
-                          }
-            with get_openai_callback() as cb:
-                response = chain.invoke(input_dict)
-                cb_str = f"OpenAI Callback for parsing of {url}: \n{cb.__str__()}\n"
-                self.logger.info(cb_str)
-            self.logger.debug(f"Received LLM response for URL: {url}")
-            return response
-        except Exception as e:
-            self.logger.error(f"Error applying LLM to text from URL {url}: {e}")
-            raise
+        Dict[str, str]
+            Dictionary mapping each URL to the LLM's response. URLs whose LLM call failed are logged and omitted.
+        """
+        llm_responses = {}
+        if self.semantic_cache is not None:
+            llm_responses = self.semantic_cache.lookup(texts, context=self.question_details_str)
+        urls = [url for url in texts if url not in llm_responses]
+        if not urls:
+            return llm_responses
+        input_dicts = [self._make_input_dict(texts[url], url) for url in urls]
+        self.logger.debug(f"Sending {len(input_dicts)} batched LLM requests.")
+        with get_openai_callback() as cb:
+            results = self._make_chain().batch(
+                input_dicts, config={"max_concurrency": MAX_CONCURRENCY, "callbacks": [self.budget_callback]},
+                return_exceptions=True)
+            self.logger.info(f"OpenAI Callback for parsing of {len(urls)} URLs: \n{cb.__str__()}\n")
+
+        new_responses = {}
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                self.logger.error(f"Error applying LLM to text from URL {url}: {result}")
+            else:
+                new_responses[url] = result
+        if self.semantic_cache is not None:
+            self.semantic_cache.update(texts, new_responses, context=self.question_details_str)
+        llm_responses.update(new_responses)
+        return llm_responses
+
+    def _make_chain(self):
+        """
+        Makes the extraction chain, which routes short texts to the cheap model and the rest to the smart one.
+
+        Responses are limited to MAX_RESPONSE_TOKENS, and transient LLM errors are retried with exponential backoff
+        (see `_is_transient_llm_error`).
+        """
+        prompt_template = ChatPromptTemplate([("system", system_str), ("user", prompt_str)])
+        branch = RunnableBranch(
+            (lambda x: estimate_tokens(x["scraped_text"]) < CHEAP_MODEL_MAX_TOKENS,
+             prompt_template | llm_cheap_cached.bind(max_tokens=MAX_RESPONSE_TOKENS) | StrOutputParser()),
+            prompt_template | llm_smart_cached.bind(max_tokens=MAX_RESPONSE_TOKENS) | StrOutputParser(),
+        )
+        return RunnableLambda(lambda input_dict, config: _invoke_with_retry(branch, input_dict, config))
+
+    def _make_input_dict(self, text: str, url: str) -> Dict[str, str]:
+        return {"question_details": self.question_details_str,
+                "url": url,
+                "scraped_text": self._truncate_to_budget(text, url),
+                }
+
+    def _truncate_to_budget(self, text: str, url: str) -> str:
+        """
+        Truncates the text so that the prompt fits in the model's context window.
+
+        Texts are only tokenized when their upper bound of tokens exceeds the budget, which compressed texts never do.
+        """
+        if max_tokens(text) <= self.scraped_text_max_tokens:
+            return text
+        encoding = get_encoding()
+        if encoding is None:
+            # Cutting the bytes keeps within the budget, dropping any character left split in half.
+            truncated_text = text.encode()[:self.scraped_text_max_tokens].decode(errors="ignore")
+        else:
+            tokens = encoding.encode(text)
+            if len(tokens) <= self.scraped_text_max_tokens:
+                return text
+            truncated_text = encoding.decode(tokens[:self.scraped_text_max_tokens])
+        self.logger.warning(f"Text from URL {url} exceeds the budget of {self.scraped_text_max_tokens} tokens, truncating it.")
+        return truncated_text
 
     def collapse_responses_in_single_str(self) -> str:
         """
@@ -136,14 +273,66 @@ class HtmlContentProcessor:
 
         This method takes the `llm_responses` attribute of the class, where each key is a URL and each value is the extracted information
         from that URL, and concatenates all the responses into a single string formatted for readability.
+        URLs that share the same response are listed together, so that the response is included only once.
         """
-        collapsed_text = ""
+        urls_by_response: Dict[str, List[str]] = {}
         for url, response in self.llm_responses.items():
-            collapsed_text += f"Information extracted from {url}:\n{response}\n\n"
-        return collapsed_text.strip()
+            urls_by_response.setdefault(response, []).append(url)
+        return "\n\n".join(f"Information extracted from {', '.join(urls)}:\n{response}"
+                           for response, urls in urls_by_response.items()).strip()
 
 
-prompt_str = """
+def _is_transient_llm_error(exception: BaseException) -> bool:
+    """
+    Whether the LLM error may go away by itself, and the request surely wasn't processed (nor billed), so it can be sent again.
+
+    The OpenAI client raises APIConnectionError (or its subclass APITimeoutError) for any transport error,
+    including read errors after the request was sent, so only failures to connect are retried.
+    """
+    if isinstance(exception, openai.APIStatusError):
+        return exception.status_code in RETRYABLE_POST_STATUS_CODES
+    return isinstance(exception, openai.APIConnectionError) and \
+        isinstance(exception.__cause__, (httpx.ConnectError, httpx.ConnectTimeout))
+
+
+@retry(stop=stop_after_attempt(4),
+       wait=wait_exponential(multiplier=1, min=1, max=20),
+       retry=retry_if_exception(_is_transient_llm_error),
+       reraise=True)
+def _invoke_with_retry(runnable, input_dict: Dict[str, str], config) -> str:
+    return runnable.invoke(input_dict, config)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast approximation of the number of tokens in a text, assuming ~4 characters per token.
+    """
+    return len(text) // 4
+
+
+@lru_cache(maxsize=None)
+def get_encoding() -> Optional[tiktoken.Encoding]:
+    """
+    Returns the tokenizer of the smart model, loaded only once. Returns None if it can't be loaded (it is downloaded on first use).
+    """
+    try:
+        return tiktoken.encoding_for_model("gpt-4o")
+    except Exception as e:
+        logger_factory.make_logger(name="HtmlContentProcessor").warning(
+            f"Failed to load the tiktoken encoding, texts will be truncated by bytes: {e}")
+        return None
+
+
+def max_tokens(text: str) -> int:
+    """
+    Upper bound of the number of tokens in a text, computed without tokenizing it: every token is at least one byte long.
+    """
+    return len(text.encode())
+
+
+# The system message only depends on the question, so it is byte-identical for every URL of a run.
+# Keeping it first lets OpenAI's automatic prompt caching reuse it across all the URL requests.
+system_str = """
 You are an assistant to a team of forecasters.
 You are trying to come up with a forecast for one or more questions.
 
@@ -151,15 +340,17 @@ You are trying to come up with a forecast for one or more questions.
 
 ------
 
-The question definition includes a link to the {url} website.
-An automatic tool scraped some text from that link, but it still has a lot of noise and non-relevant content.
+The question definition includes links to some websites.
+An automatic tool scraped some text from one of those links, but it still has a lot of noise and non-relevant content.
 Your task is to read the text and extract a bullet list of facts and information that is relevant to the forecast that your team has to make.
 Just extract the information and report it. Be thorough in your summary, paying special attention to dates and numbers, when relevant.
 Also be sure to differentiate facts from opinions.
 Don't add anything extra, since that is a job for the senior members of your group, not you.
+"""
 
-Here is the scraped text:
+prompt_str = """
+Here is the text scraped from the {url} website:
 ```
 {scraped_text}
 ```
-"""
\ No newline at end of file
+"""
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from functools import cached_property
 from typing import Dict, Optional, Any
 from datetime import datetime
 
@@ -9,6 +10,7 @@ class QuestionDetails:
     Dataclass that encapsulates the details of a question.
 
     This class provides properties to access different parts of the question details.
+    Timestamps are parsed only once, on first access, and then cached in the instance.
 
     Parameters
     ----------
@@ -72,50 +74,45 @@ class QuestionDetails:
     def resolution(self) -> Optional[bool]:
         return self.details_dict.get('resolution')
 
-    @property
+    @cached_property
     def publish_time(self) -> Optional[datetime]:
-        maybe_time = self.details_dict.get('publish_time')
-        return datetime.fromisoformat(maybe_time) if maybe_time else None
+        return self._parse_time('publish_time')
 
     @property
     def publish_date(self) -> Optional[str]:
-        return self.publish_time.strftime("%Y-%m-%d") if self.publish_time else None
+        return self.publish_time.date().isoformat() if self.publish_time else None
 
-    @property
+    @cached_property
     def created_time(self) -> Optional[datetime]:
-        maybe_time = self.details_dict.get('created_time')
-        return datetime.fromisoformat(maybe_time) if maybe_time else None
+        return self._parse_time('created_time')
 
     @property
     def created_date(self) -> Optional[str]:
-        return self.created_time.strftime("%Y-%m-%d") if self.created_time else None
+        return self.created_time.date().isoformat() if self.created_time else None
 
-    @property
+    @cached_property
     def close_time(self) -> Optional[datetime]:
-        maybe_time = self.details_dict.get('close_time')
-        return datetime.fromisoformat(maybe_time) if maybe_time else None
+        return self._parse_time('close_time')
 
     @property
     def close_date(self) -> Optional[str]:
-        return self.close_time.strftime("%Y-%m-%d") if self.close_time else None
+        return self.close_time.date().isoformat() if self.close_time else None
 
-    @property
+    @cached_property
     def resolve_time(self) -> Optional[datetime]:
-        maybe_time = self.details_dict.get('resolve_time')
-        return datetime.fromisoformat(maybe_time) if maybe_time else None
+        return self._parse_time('resolve_time')
 
     @property
     def resolve_date(self) -> Optional[str]:
-        return self.resolve_time.strftime("%Y-%m-%d") if self.resolve_time else None
+        return self.resolve_time.date().isoformat() if self.resolve_time else None
 
-    @property
+    @cached_property
     def last_activity_time(self) -> Optional[datetime]:
-        maybe_time = self.details_dict.get('last_activity_time')
-        return datetime.fromisoformat(maybe_time) if maybe_time else None
+        return self._parse_time('last_activity_time')
 
     @property
     def last_activity_date(self) -> Optional[str]:
-        return self.last_activity_time.strftime("%Y-%m-%d") if self.last_activity_time else None
+        return self.last_activity_time.date().isoformat() if self.last_activity_time else None
 
     @property
     def activity(self) -> Optional[float]:
@@ -136,3 +133,7 @@ class QuestionDetails:
     @property
     def project_ids(self) -> Optional[str]:
         return [project.get("id") for project in self.projects] if self.projects else None
+
+    def _parse_time(self, key: str) -> Optional[datetime]:
+        maybe_time = self.details_dict.get(key)
+        return datetime.fromisoformat(maybe_time) if maybe_time else None
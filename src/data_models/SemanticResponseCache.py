@@ -0,0 +1,128 @@
+import hashlib
+import os
+from typing import Dict, List, Optional
+
+import chromadb
+from langchain_openai import OpenAIEmbeddings
+from src.config import DATA_DIR, OPENAI_API_KEY, TEXT_EMBEDDING_MODEL, logger_factory
+
+
+class SemanticResponseCache:
+    """
+    Cache of LLM responses, keyed by the embedding of the whole text that was sent to the LLM.
+
+    A cached response is returned when a new text is close enough (in cosine distance) to a previously processed one,
+    and it was processed with the same context (e.g. the same question details), since the response depends on both.
+    Whole texts are embedded (not just their beginning), so that pages of the same site that start with the same
+    boilerplate aren't mistaken for each other.
+    The cache is persisted in a Chroma collection in the repo's data directory, which is only opened on first use.
+
+    Parameters
+    ----------
+    collection_name : str
+        Name of the Chroma collection where the responses are stored.
+    max_distance : float
+        Maximum cosine distance between two texts for them to be considered the same.
+
+    Examples
+    --------
+    >>> cache = SemanticResponseCache()
+    >>> cached_responses = cache.lookup({"https://example.com": "Some text"}, context="Question details")
+    >>> cache.update({"https://example.com": "Some text"}, {"https://example.com": "- A fact"}, context="Question details")
+    """
+
+    def __init__(self, collection_name: str = "html_summaries", max_distance: float = 0.05):
+        self.logger = logger_factory.make_logger("Semantic Response Cache")
+        self.collection_name = collection_name
+        self.max_distance = max_distance
+        self._embeddings_by_hash: Dict[str, List[float]] = {}
+        self._collection: Optional[chromadb.Collection] = None
+
+        self.embeddings = OpenAIEmbeddings(
+            api_key=OPENAI_API_KEY, model=TEXT_EMBEDDING_MODEL)
+
+    @property
+    def collection(self) -> chromadb.Collection:
+        if self._collection is None:
+            persistent_client = chromadb.PersistentClient(
+                path=os.path.join(DATA_DIR, "chroma_langchain_db"))
+            self._collection = persistent_client.get_or_create_collection(
+                self.collection_name,
+                metadata={"hnsw:space": "cosine"})
+        return self._collection
+
+    def lookup(self, texts: Dict[str, str], context: str) -> Dict[str, str]:
+        """
+        Looks up the cached responses for the given texts.
+
+        Parameters
+        ----------
+        texts : Dict[str, str]
+            Dictionary mapping each URL to its text.
+        context : str
+            The rest of the information that was sent to the LLM along with the text.
+
+        Returns
+        -------
+        Dict[str, str]
+            Dictionary mapping the URLs that had a cache hit to their cached response.
+        """
+        if not texts:
+            return {}
+        try:
+            embeddings = self._embed(list(texts.values()))
+            result = self.collection.query(query_embeddings=embeddings,
+                                           n_results=1,
+                                           where={"context_hash": _hash(context)},
+                                           include=["metadatas", "distances"])
+        except Exception as e:
+            self.logger.warning(f"Failed to look up the semantic cache: {e}")
+            return {}
+        cached_responses = {}
+        for url, distances, metadatas in zip(texts, result["distances"], result["metadatas"]):
+            if distances and distances[0] <= self.max_distance:
+                self.logger.debug(f"Semantic cache hit for URL {url} (distance {distances[0]:.4f}).")
+                cached_responses[url] = metadatas[0]["response"]
+        return cached_responses
+
+    def update(self, texts: Dict[str, str], responses: Dict[str, str], context: str):
+        """
+        Stores the responses obtained for the given texts.
+
+        Parameters
+        ----------
+        texts : Dict[str, str]
+            Dictionary mapping each URL to its text.
+        responses : Dict[str, str]
+            Dictionary mapping each URL to the LLM's response. URLs without a response are skipped.
+        context : str
+            The rest of the information that was sent to the LLM along with the text.
+        """
+        urls = [url for url in texts if url in responses]
+        if not urls:
+            return
+        try:
+            self.collection.upsert(
+                ids=[_hash(context + texts[url]) for url in urls],
+                embeddings=self._embed([texts[url] for url in urls]),
+                documents=[texts[url] for url in urls],
+                metadatas=[{"url": url, "context_hash": _hash(context), "response": responses[url]} for url in urls])
+        except Exception as e:
+            self.logger.warning(f"Failed to update the semantic cache: {e}")
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds each text, reusing the embeddings that were already computed.
+
+        Texts longer than the embedding model's context are split into chunks by OpenAIEmbeddings, and their embeddings averaged.
+        """
+        texts_by_hash = {_hash(text): text for text in texts}
+        missing_hashes = [h for h in texts_by_hash if h not in self._embeddings_by_hash]
+        if missing_hashes:
+            new_embeddings = self.embeddings.embed_documents([texts_by_hash[h] for h in missing_hashes])
+            self._embeddings_by_hash.update(zip(missing_hashes, new_embeddings))
+        return [self._embeddings_by_hash[_hash(text)] for text in texts]
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
@@ -7,9 +7,17 @@ from src.config import OPENAI_API_KEY, TEXT_EMBEDDING_MODEL, logger_factory
 from src.metaculus import list_questions
 from src.data_models.QuestionDetails import QuestionDetails
 from langchain_core.documents import Document
-from typing import Dict
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Dict, List, Set
 
 
+# Number of documents accumulated before embedding them, matching the default chunk_size of OpenAIEmbeddings.
+EMBEDDING_BATCH_SIZE = 1000
+PAGE_SIZE = 100
+# Number of pages of questions requested to Metaculus concurrently.
+MAX_CONCURRENT_PAGES = 8
+
 
 class VectorStoreManager:
     """
@@ -45,29 +53,60 @@ class VectorStoreManager:
         Updates the vector store with the latest questions from Metaculus.
         
         Adds questions that are not already in the vector store, until no new questions are found.
+        Up to MAX_CONCURRENT_PAGES pages are requested ahead, but they are processed in order, so that
+        the search stops at the first page without new questions.
+        New documents are accumulated across pages and embedded in batches of EMBEDDING_BATCH_SIZE.
+        """
+        pending_documents: List[Document] = []
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_PAGES) as executor:
+            pages: Deque[Future] = deque(
+                executor.submit(self._list_questions_page, offset)
+                for offset in range(0, MAX_CONCURRENT_PAGES * PAGE_SIZE, PAGE_SIZE))
+            next_offset = MAX_CONCURRENT_PAGES * PAGE_SIZE
+            while pages:
+                ls = pages.popleft().result()
+                if len(ls["results"]) == 0:
+                    self.logger.debug("No more questions found, stopping.")
+                    break
+                question_details_list = [QuestionDetails(details_dict) for details_dict in ls["results"]]
+                existing_ids = self._existing_ids(question_details_list) | {doc.id for doc in pending_documents}
+                filtered_question_details_list = [qd for qd in question_details_list if str(qd.id) not in existing_ids]
+                new_document_list = [self._document_from_question_details(qd) for qd in filtered_question_details_list]
+                if len(new_document_list) == 0:
+                    self.logger.debug("No new documents found, stopping.")
+                    break
+                self.logger.info(f"Found {len(new_document_list)} new documents, going from {filtered_question_details_list[0].publish_date} to {filtered_question_details_list[-1].publish_date}")
+                pending_documents.extend(new_document_list)
+                if len(pending_documents) >= EMBEDDING_BATCH_SIZE:
+                    self._add_documents(pending_documents)
+                    pending_documents = []
+                pages.append(executor.submit(self._list_questions_page, next_offset))
+                next_offset += PAGE_SIZE
+            for page in pages:
+                page.cancel()
+        self._add_documents(pending_documents)
+
+    def _existing_ids(self, question_details_list: List[QuestionDetails]) -> Set[str]:
+        """
+        Returns the IDs (as strings) of the given questions that are already in the vector store.
         """
-        existing_ids = [int(id_str) for id_str in self.vector_store.get(include=[]).get("ids")]
-        current_offset = 0
-        while True:
-            ls = list_questions(tournament_id=None,
-                                order_by="-publish_time",
-                                offset=current_offset,
-                                count=100,
-                                status=None,
-                                forecast_type="binary")
-            if len(ls["results"]) == 0:
-                self.logger.debug("No more questions found, stopping.")
-                break
-            question_details_list = [QuestionDetails(details_dict) for details_dict in ls["results"]]
-            filtered_question_details_list = [qd for qd in question_details_list if qd.id not in existing_ids]
-            new_document_list = [self._document_from_question_details(qd) for qd in filtered_question_details_list]
-            if len(new_document_list) == 0:
-                self.logger.debug("No new documents found, stopping.")
-                break
-            self.logger.info(f"Adding {len(new_document_list)} new documents to the vector store, going from {filtered_question_details_list[0].publish_date} to {filtered_question_details_list[-1].publish_date}")
-            self.vector_store.add_documents(new_document_list)
-            current_offset += 100
-    
+        ids = [str(qd.id) for qd in question_details_list]
+        return set(self.vector_store.get(ids=ids, include=[]).get("ids"))
+
+    def _list_questions_page(self, offset: int) -> Dict:
+        return list_questions(tournament_id=None,
+                              order_by="-publish_time",
+                              offset=offset,
+                              count=PAGE_SIZE,
+                              status=None,
+                              forecast_type="binary")
+
+    def _add_documents(self, documents: List[Document]):
+        if len(documents) == 0:
+            return
+        self.logger.info(f"Adding {len(documents)} new documents to the vector store.")
+        self.vector_store.add_documents(documents)
+
     def _metadata_from_question_details(self, qd: QuestionDetails) -> Dict:
         return {
         "question_id": qd.id,
@@ -76,10 +115,9 @@ class VectorStoreManager:
         "close_date": qd.close_date,
         "resolve_date" : qd.resolve_date,
         "created_timestamp" : qd.created_time.timestamp() if qd.created_time else None,
-        "publish_timestamp" : qd.publish_time.timestamp() if qd.created_time else None,
-        "close_timestamp" : qd.close_time.timestamp() if qd.created_time else None,
-        "resolve_timestamp" : qd.resolve_time.timestamp() if qd.created_time else None,
-        "resolve_timestamp" : qd.resolve_time.timestamp() if qd.created_time else None,
+        "publish_timestamp" : qd.publish_time.timestamp() if qd.publish_time else None,
+        "close_timestamp" : qd.close_time.timestamp() if qd.close_time else None,
+        "resolve_timestamp" : qd.resolve_time.timestamp() if qd.resolve_time else None,
         "last_activity_date" : qd.last_activity_date,
         "forecast_type": qd.forecast_type,
         "project_ids": str(qd.project_ids),
@@ -1,8 +1,27 @@
-from lxml.html.clean import Cleaner
-from bs4 import BeautifulSoup, FeatureNotFound
+import hashlib
+import os
 import re
 import requests
-from typing import List
+import threading
+from collections import Counter
+from requests_cache import CachedSession
+from selectolax.lexbor import LexborHTMLParser
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+from typing import List, Optional, Set
+from src.config import HTTP_CACHE_PATH, RETRYABLE_STATUS_CODES
+
+
+UNWANTED_TAGS_SELECTOR = "script, style, noscript, iframe, frame, form, svg, object, embed, applet, blink, marquee"
+
+_URL_RE = re.compile(r'https?://[^\s\)\]\}\>\,]+')
+_WS_SPACE_RE = re.compile(r'[ \t]+')
+_WS_NL_RE = re.compile(r'\n+')
+_WORD_RE = re.compile(r'[a-z]{4,}')
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+|\n')
+_DIGITS_RE = re.compile(r'\d+')
+
+_session: Optional[CachedSession] = None
+_session_lock = threading.Lock()
 
 
 def extract_urls(text: str) -> List[str]:
@@ -15,13 +34,16 @@ def extract_urls(text: str) -> List[str]:
     Returns:
         List[str]: A list of URLs found in the text.
     """
-    return re.findall(r'https?://[^\s\)\]\}\>\,]+', text)
+    return _URL_RE.findall(text)
 
 
 def fetch_html(url: str) -> str:
     """
     Fetches the HTML content of the given URL.
 
+    Responses are cached on disk, so fetching the same URL again within a day doesn't hit the network.
+    Transient errors (connection problems, timeouts, 429 and 5xx responses) are retried with exponential backoff.
+
     Parameters:
         url (str): The URL from which to fetch HTML content.
 
@@ -32,70 +54,40 @@ def fetch_html(url: str) -> str:
         Exception: If an error occurs during the HTTP request.
     """
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()  # Verify that the request was successful
+        response = _get_with_retry(url)
     except requests.exceptions.RequestException as e:
         raise Exception(f"Error fetching {url}: {e}")
     return response.text
 
 
-def clean_html_content(html: str) -> str:
-    """
-    Cleans the given HTML content by removing scripts, comments, styles, and other unwanted elements.
+def _is_transient_error(exception: BaseException) -> bool:
+    if isinstance(exception, requests.exceptions.HTTPError):
+        return exception.response is not None and exception.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(exception, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
 
-    Parameters:
-        html (str): The raw HTML content to be cleaned.
 
-    Returns:
-        str: The cleaned HTML content.
+@retry(stop=stop_after_attempt(4),
+       wait=wait_exponential(multiplier=1, min=1, max=20),
+       retry=retry_if_exception(_is_transient_error),
+       reraise=True)
+def _get_with_retry(url: str) -> requests.Response:
+    response = _get_session().get(url, timeout=10)
+    response.raise_for_status()  # Verify that the request was successful
+    return response
 
-    Raises:
-        Exception: If an error occurs during HTML cleaning.
-    """
-    cleaner = Cleaner(
-        scripts=True,
-        javascript=True,
-        comments=True,
-        style=True,
-        links=False,
-        meta=False,
-        page_structure=False,
-        processing_instructions=True,
-        embedded=True,
-        frames=True,
-        forms=True,
-        annoying_tags=True,
-        safe_attrs_only=True
-    )
-    try:
-        clean_html = cleaner.clean_html(html)
-    except Exception as e:
-        raise Exception(f"An error occurred while cleaning HTML content: {e}")
-    return clean_html
 
-
-def strip_html_tags(html_content: str) -> str:
+def _get_session() -> CachedSession:
     """
-    Strips HTML tags from the given HTML content and returns the text content.
-
-    Parameters:
-        html_content (str): The HTML content from which to extract text.
+    Returns the session used to fetch pages, created (along with its cache database) only on first use.
 
-    Returns:
-        str: The extracted text content without HTML tags.
-
-    Raises:
-        Exception: If an error occurs during HTML parsing.
+    Fetched pages are cached on disk for a day. Responses with ETag/Last-Modified headers are revalidated with conditional requests.
     """
-    try:
-        soup = BeautifulSoup(html_content, "lxml")
-        text = soup.get_text(separator='\n').strip()
-    except FeatureNotFound:
-        raise Exception(
-            "The 'lxml' parser is not available. Please install it or choose a different parser.")
-    except Exception as e:
-        raise Exception(f"An error occurred while stripping HTML tags: {e}")
-    return text
+    global _session
+    with _session_lock:
+        if _session is None:
+            os.makedirs(os.path.dirname(HTTP_CACHE_PATH), exist_ok=True)
+            _session = CachedSession(cache_name=HTTP_CACHE_PATH, backend='sqlite', expire_after=86400, cache_control=True)
+        return _session
 
 
 def clean_whitespace(text: str) -> str:
@@ -109,11 +101,8 @@ def clean_whitespace(text: str) -> str:
     Returns:
         str: The text content with cleaned whitespace.
     """
-    try:
-        text = re.sub(r'[ \t]+', ' ', text)
-        text = re.sub(r'\n+', '\n', text)
-    except re.error as e:
-        raise Exception(f"An error occurred while cleaning whitespace: {e}")
+    text = _WS_SPACE_RE.sub(' ', text)
+    text = _WS_NL_RE.sub('\n', text)
     return text.strip()
 
 
@@ -122,8 +111,8 @@ def clean_html(html: str) -> str:
     Cleans the given HTML content and extracts the text content with cleaned whitespace.
 
     This function performs the following steps:
-    1. Cleans the HTML content using `clean_html_content`.
-    2. Strips HTML tags using `strip_html_tags`.
+    1. Parses the HTML and removes scripts, styles, forms, frames and embedded content.
+    2. Extracts the text of the body, one line per text node.
     3. Cleans up whitespace using `clean_whitespace`.
 
     Parameters:
@@ -131,8 +120,106 @@ def clean_html(html: str) -> str:
 
     Returns:
         str: The final cleaned text content.
+
+    Raises:
+        Exception: If an error occurs during HTML parsing.
+    """
+    try:
+        tree = LexborHTMLParser(html)
+        for node in tree.css(UNWANTED_TAGS_SELECTOR):
+            node.decompose()
+        text = tree.body.text(separator='\n', strip=True) if tree.body else ''
+    except Exception as e:
+        raise Exception(f"An error occurred while cleaning HTML content: {e}")
+    return clean_whitespace(text)
+
+
+STOP_WORDS = frozenset([
+    "about", "after", "also", "been", "before", "being", "between", "both", "could", "does", "each", "from",
+    "have", "into", "more", "most", "must", "only", "other", "over", "same", "should", "some", "such",
+    "than", "that", "their", "them", "then", "there", "these", "they", "this", "those", "through", "under",
+    "until", "upon", "very", "were", "what", "when", "where", "which", "while", "will", "with", "would", "your",
+])
+
+
+def extract_keywords(text: str) -> Set[str]:
+    """
+    Extracts the set of lowercase words of at least 4 letters in the text, excluding common stop words.
+
+    Parameters:
+        text (str): The text from which to extract keywords.
+
+    Returns:
+        Set[str]: The keywords found in the text.
+    """
+    return {word for word in _WORD_RE.findall(text.lower()) if word not in STOP_WORDS}
+
+
+def compress_text(text: str, keywords: Set[str], max_chars: int) -> str:
+    """
+    Shortens the text to at most `max_chars` characters by keeping only its most relevant sentences.
+
+    Sentences are scored by the number of keywords they contain (plus one if they contain a number),
+    and the best scoring ones are kept, in their original order, until the budget is filled.
+    Sentences that don't fit in the budget on their own (e.g. in minified text, CSV or JSON) are split into pieces that do.
+    Texts that already fit in the budget are returned unchanged.
+
+    Parameters:
+        text (str): The text to be compressed.
+        keywords (Set[str]): Keywords that make a sentence relevant, as returned by `extract_keywords`.
+        max_chars (int): Maximum length of the compressed text.
+
+    Returns:
+        str: The compressed text.
+    """
+    if len(text) <= max_chars:
+        return text
+    # Each kept sentence takes one extra character for the newline that joins it.
+    piece_chars = max(max_chars - 1, 1)
+    sentences = [sentence[start:start + piece_chars]
+                 for sentence in _SENTENCE_SPLIT_RE.split(text) if sentence.strip()
+                 for start in range(0, len(sentence), piece_chars)]
+
+    def score(sentence: str) -> int:
+        keyword_hits = len(extract_keywords(sentence) & keywords)
+        return keyword_hits + (1 if _DIGITS_RE.search(sentence) else 0)
+
+    ranking = sorted(range(len(sentences)), key=lambda i: score(sentences[i]), reverse=True)
+    kept_indexes = []
+    used_chars = 0
+    for i in ranking:
+        if used_chars + len(sentences[i]) + 1 > max_chars:
+            continue
+        kept_indexes.append(i)
+        used_chars += len(sentences[i]) + 1
+    return "\n".join(sentences[i] for i in sorted(kept_indexes))
+
+
+def simhash(text: str) -> int:
+    """
+    Computes a 64-bit SimHash fingerprint of the given text.
+
+    Texts that are almost identical produce fingerprints that differ in only a few bits,
+    so the fingerprints can be compared with `hamming_distance` to detect near-duplicates.
+    Digits are kept, since pages that differ only in their figures or dates carry different information.
+
+    Parameters:
+        text (str): The text to fingerprint.
+
+    Returns:
+        int: The 64-bit fingerprint.
+    """
+    normalized = text.lower()
+    weights = [0] * 64
+    for token, count in Counter(normalized.split()).items():
+        token_hash = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += count if token_hash >> bit & 1 else -count
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def hamming_distance(fingerprint_a: int, fingerprint_b: int) -> int:
+    """
+    Returns the number of bits that differ between two fingerprints.
     """
-    clean_html = clean_html_content(html)
-    stripped_text = strip_html_tags(clean_html)
-    cleaned_text = clean_whitespace(stripped_text)
-    return cleaned_text
+    return (fingerprint_a ^ fingerprint_b).bit_count()
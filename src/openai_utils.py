@@ -1,11 +1,39 @@
-import json
+import asyncio
+import threading
+import httpx
+import orjson
 import requests
-from src.config import METACULUS_TOKEN, METACULUS_OPENAI_PROXY_URL, OPENAI_MODEL_SMART
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from src.config import METACULUS_TOKEN, METACULUS_OPENAI_PROXY_URL, OPENAI_MODEL_SMART, RETRYABLE_POST_STATUS_CODES
 from src.data_models.CompletionResponse import CompletionResponse
 from langchain_openai import ChatOpenAI
+from langchain_community.cache import SQLiteCache
+from langchain_community.callbacks.openai_info import OpenAICallbackHandler
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
 
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
+
+PROXY_BASE_URL = "https://www.metaculus.com/proxy/openai/v1"
+
+# Completions can take a while, so only the connection phase gets a short timeout.
+PROXY_TIMEOUT = httpx.Timeout(300.0, connect=10.0)
+
+# Shared by all the synchronous calls to the proxy, so that connections (and their TLS handshakes) are reused.
+# Read errors, and status codes other than RETRYABLE_POST_STATUS_CODES, are not retried: the request may already
+# have been processed (and billed), and retrying would pay for it again.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=3,
+                      read=0,
+                      backoff_factor=0.5,
+                      status_forcelist=RETRYABLE_POST_STATUS_CODES,
+                      allowed_methods=frozenset(["POST"]),
+                      raise_on_status=False)))
 
 
 def get_gpt_prediction_via_proxy(messages: List[Dict[str, str]], model: str = "gpt-4o") -> CompletionResponse:
@@ -22,6 +50,91 @@ def get_gpt_prediction_via_proxy(messages: List[Dict[str, str]], model: str = "g
     Returns:
         Dict[str, Any]: Forwarded response of the OpenAI API.
     """
+    headers = _make_proxy_headers()
+
+    data_request = {
+        "model": model,
+        "messages": messages
+    }
+
+    response = _SESSION.post(METACULUS_OPENAI_PROXY_URL,
+                             headers=headers, data=orjson.dumps(data_request), timeout=(10, 300))
+    response.raise_for_status()
+
+    # gpt_text = response.json()["choices"][0]["message"]["content"]
+    return CompletionResponse(response.json())
+
+
+def _is_transient_error(exception: BaseException) -> bool:
+    if isinstance(exception, httpx.HTTPStatusError):
+        return exception.response.status_code in RETRYABLE_POST_STATUS_CODES
+    # Only errors raised before the request was sent. Like in `_SESSION`, read errors are not retried.
+    return isinstance(exception, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+
+
+@retry(stop=stop_after_attempt(4),
+       wait=wait_exponential(multiplier=1, min=1, max=20),
+       retry=retry_if_exception(_is_transient_error),
+       reraise=True)
+async def aget_gpt_prediction_via_proxy(messages: List[Dict[str, str]], model: str = "gpt-4o",
+                                        client: Optional[httpx.AsyncClient] = None) -> CompletionResponse:
+    """
+    Async version of `get_gpt_prediction_via_proxy`, retrying rate limits and unavailable servers with exponential backoff.
+
+    Args:
+        messages (List[Dict[str, str]]): `messages` parameter to be forwarded to the OpenAI API.
+        model (str): OpenAI model to be used.
+        client (httpx.AsyncClient): Client used to make the request, so that connections can be reused between calls.
+            If None, a new client is created for this request.
+
+    Returns:
+        CompletionResponse: Forwarded response of the OpenAI API.
+    """
+    headers = _make_proxy_headers()
+
+    data_request = {
+        "model": model,
+        "messages": messages
+    }
+
+    if client is None:
+        async with _make_async_client() as client:
+            response = await client.post(METACULUS_OPENAI_PROXY_URL, headers=headers, content=orjson.dumps(data_request))
+    else:
+        response = await client.post(METACULUS_OPENAI_PROXY_URL, headers=headers, content=orjson.dumps(data_request))
+    response.raise_for_status()
+
+    return CompletionResponse(response.json())
+
+
+async def gather_predictions(list_of_messages: List[List[Dict[str, str]]], model: str = "gpt-4o",
+                             max_concurrency: int = 8) -> List[Union[CompletionResponse, BaseException]]:
+    """
+    Requests several predictions through the Metaculus proxy concurrently.
+
+    At most `max_concurrency` requests are in flight at the same time, all of them sharing the same connection pool.
+    Failed requests don't cancel the rest: their exception is returned in place of the response.
+
+    Args:
+        list_of_messages (List[List[Dict[str, str]]]): `messages` parameter of each request.
+        model (str): OpenAI model to be used.
+        max_concurrency (int): Maximum number of concurrent requests.
+
+    Returns:
+        List[Union[CompletionResponse, BaseException]]: The responses, in the same order as `list_of_messages`.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    # The client is bound to the running event loop, so it can't be kept at module level and reused across asyncio.run calls.
+    async with _make_async_client(max_concurrency) as client:
+        async def predict(messages: List[Dict[str, str]]) -> CompletionResponse:
+            async with semaphore:
+                return await aget_gpt_prediction_via_proxy(messages, model=model, client=client)
+
+        return await asyncio.gather(*(predict(messages) for messages in list_of_messages), return_exceptions=True)
+
+
+def _make_proxy_headers() -> Dict[str, str]:
     if METACULUS_TOKEN is None:
         raise ValueError(
             "The environment variable METACULUS_TOKEN is not set.")
@@ -30,22 +143,25 @@ def get_gpt_prediction_via_proxy(messages: List[Dict[str, str]], model: str = "g
         raise ValueError(
             "The environment variable METACULUS_OPENAI_PROXY_URL is not set.")
 
-    headers = {
+    return {
         "Content-Type": "application/json",
         "Authorization": f"Token {METACULUS_TOKEN}"
     }
 
-    data_request = {
-        "model": model,
-        "messages": messages
-    }
 
-    response = requests.post(METACULUS_OPENAI_PROXY_URL,
-                             headers=headers, data=json.dumps(data_request))
-    response.raise_for_status()
+def _make_async_client(max_connections: int = 8) -> httpx.AsyncClient:
+    return httpx.AsyncClient(http2=True,
+                             timeout=PROXY_TIMEOUT,
+                             limits=httpx.Limits(max_connections=max_connections,
+                                                 max_keepalive_connections=max_connections))
 
-    # gpt_text = response.json()["choices"][0]["message"]["content"]
-    return CompletionResponse(response.json())
+
+
+def close():
+    """
+    Closes the connections kept open by `get_gpt_prediction_via_proxy`.
+    """
+    _SESSION.close()
 
 
 def collapse_messages_into_string(messages: List[Dict[str, str]]) -> str:
@@ -60,8 +176,7 @@ def collapse_messages_into_string(messages: List[Dict[str, str]]) -> str:
     Returns:
     - str: A single string containing all the messages.
     """
-    contents = [msg["content"] for msg in messages]
-    return "\n".join(contents)
+    return "\n".join(msg["content"] for msg in messages)
 
 
 def make_proxied_ChatOpenAI_LLM(model: Optional[str] = None, metaculus_token: Optional[str] = None, **kwargs) -> ChatOpenAI:
@@ -91,7 +206,74 @@ def make_proxied_ChatOpenAI_LLM(model: Optional[str] = None, metaculus_token: Op
     return ChatOpenAI(
         model=model,
         api_key="Non empty string to avoid validation error",
-        base_url = "https://www.metaculus.com/proxy/openai/v1",
+        base_url = PROXY_BASE_URL,
         default_headers=headers,
         **kwargs
-    )
\ No newline at end of file
+    )
+
+
+class LazySQLiteCache(BaseCache):
+    """
+    LLM cache backed by SQLite, like langchain's `SQLiteCache`, but the database (and its directory) is only
+    created on first use, instead of when the cache is instantiated.
+
+    Parameters
+    ----------
+    database_path : str
+        Path of the SQLite database file.
+    """
+
+    def __init__(self, database_path: str):
+        self.database_path = database_path
+        self._cache: Optional[SQLiteCache] = None
+        self._lock = threading.Lock()
+
+    def _get_cache(self) -> SQLiteCache:
+        with self._lock:
+            if self._cache is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.database_path)), exist_ok=True)
+                self._cache = SQLiteCache(database_path=self.database_path)
+            return self._cache
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        return self._get_cache().lookup(prompt, llm_string)
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        self._get_cache().update(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        self._get_cache().clear(**kwargs)
+
+
+class BudgetCallbackHandler(OpenAICallbackHandler):
+    """
+    Callback handler that tracks the cost of the OpenAI calls, and stops making calls once a budget is exceeded.
+
+    Costs are computed with langchain's OpenAI pricing table, like `get_openai_callback` does.
+    Once the budget is exceeded, any further LLM call made with this handler raises a RuntimeError before reaching the API.
+    The call that crosses the budget is already paid for, so its response is still returned.
+
+    Parameters
+    ----------
+    budget_usd : float
+        Maximum amount of USD to spend.
+
+    Examples
+    --------
+    >>> budget_callback = BudgetCallbackHandler(budget_usd=0.5)
+    >>> chain.batch(inputs, config={"callbacks": [budget_callback]})
+    """
+
+    raise_error: bool = True
+
+    def __init__(self, budget_usd: float):
+        super().__init__()
+        self.budget_usd = budget_usd
+
+    @property
+    def budget_exceeded(self) -> bool:
+        return self.total_cost > self.budget_usd
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any) -> None:
+        if self.budget_exceeded:
+            raise RuntimeError(f"Budget of ${self.budget_usd} exceeded (spent ${self.total_cost}), refusing to make more LLM calls.")
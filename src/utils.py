@@ -1,6 +1,28 @@
-import re
-import json
-from typing import Dict, List
+from ast import literal_eval
+from typing import Dict, Iterable, List
+
+try:
+    import orjson
+
+    # orjson reads str directly, so there is no need to encode the responses into bytes beforehand.
+    _loads = orjson.loads
+    JSONDecodeError = orjson.JSONDecodeError
+except ImportError:
+    import json
+
+    _loads = json.loads
+    JSONDecodeError = json.JSONDecodeError
+
+try:
+    import simdjson
+
+    # Reused across calls so that its internal buffers are only allocated once. Not thread-safe.
+    _PARSER = simdjson.Parser()
+except ImportError:
+    _PARSER = None
+
+# Maps every ASCII control character to None, so that str.translate deletes them.
+_CONTROL_CHARS_TABLE = dict.fromkeys([*range(0x20), 0x7f])
 
 
 def trim_beginning_of_string(input_string: str, delimiter: str) -> str:
@@ -27,8 +49,7 @@ def sanitize_json_str_with_backticks(s: str) -> str:
 
 def remove_unescaped(s):
     # Remove any unescaped control characters
-    s = re.sub(r'[\x00-\x1f\x7f]', '', s)
-    return s
+    return s.translate(_CONTROL_CHARS_TABLE)
 
 def try_to_parse_json(s):
     """
@@ -41,14 +62,14 @@ def try_to_parse_json(s):
     # TODO: BORRAR COMENTARIOS
 
     try:
-        return json.loads(s)
-    except:
+        return _loads(s)
+    except JSONDecodeError:
         print(f"Failed to parse: \n{s}")
         pass
     s = remove_unescaped(s)
     try:
-        return json.loads(s)
-    except json.JSONDecodeError as e:
+        return _loads(s)
+    except JSONDecodeError as e:
         print(f"Failed to parse: \n{s}")
         raise e
 
@@ -58,9 +79,53 @@ def find_first_and_last_braces(s):
     return index_first, index_last
 
 def try_to_find_and_eval_dict(input_string: str) -> Dict:
+    """
+    Parses the dictionary found between the first and last braces of a string.
+
+    The dictionary is parsed as JSON, or else as a Python literal (e.g. with single-quoted strings), which is safe
+    because `ast.literal_eval` doesn't execute any code.
+    """
     index_first, index_last = find_first_and_last_braces(input_string)
     trimmed = input_string[index_first:index_last+1]
     try:
-        return eval(trimmed)
-    except:
-        raise ValueError(f"Failed to evaluate the following string:\n{trimmed}")
\ No newline at end of file
+        try:
+            return _loads(trimmed)
+        except JSONDecodeError:
+            return literal_eval(trimmed)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        raise ValueError(f"Failed to evaluate the following string:\n{trimmed}")
+
+
+def parse_json_projected(input_string: str, keys: Iterable[str]) -> Dict:
+    """
+    Parses the JSON object found between the first and last braces of a string, keeping only the requested keys.
+
+    When pysimdjson is available, the values of the rest of the keys are never converted into Python objects.
+    Strings that aren't valid JSON are parsed as Python literals (e.g. with single-quoted strings), like in
+    `try_to_find_and_eval_dict`. Keys missing from the object are also missing from the returned dictionary.
+    """
+    index_first, index_last = find_first_and_last_braces(input_string)
+    trimmed = remove_unescaped(input_string[index_first:index_last+1])
+    try:
+        if _PARSER is None:
+            doc = _loads(trimmed)
+            return {key: doc[key] for key in keys if key in doc}
+        doc = _PARSER.parse(trimmed.encode())
+        return {key: _materialize(doc[key]) for key in keys if key in doc}
+    except (ValueError, RuntimeError):
+        pass
+    try:
+        doc = literal_eval(trimmed)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        doc = None
+    if not isinstance(doc, dict):
+        raise ValueError(f"Failed to parse the following string:\n{trimmed}")
+    return {key: doc[key] for key in keys if key in doc}
+
+
+def _materialize(value):
+    if isinstance(value, simdjson.Object):
+        return value.as_dict()
+    if isinstance(value, simdjson.Array):
+        return value.as_list()
+    return value
@@ -1,6 +1,8 @@
 import pytest
 from src.data_models.CompletionResponse import CompletionResponse
 
+pytestmark = pytest.mark.unit
+
 class TestCompletionResponse:
     
     response_json_example = {
@@ -132,3 +134,9 @@ class TestCompletionResponse:
         assert completion_response.total_tokens is None
         assert completion_response.tokens_all == 'None, None, None'
 
+    def test_properties_are_cached(self):
+        completion_response = CompletionResponse(dict(self.response_json_example))
+
+        assert completion_response.content == '...Here comes a lot of text...'
+        completion_response.response_json['choices'] = []
+        assert completion_response.content == '...Here comes a lot of text...'
@@ -1,6 +1,7 @@
 import pytest
 from unittest.mock import patch, MagicMock
-from src.data_models.DetailsPreparation import DetailsPreparation
+import asyncio
+from src.data_models.DetailsPreparation import DetailsPreparation, afetch_detail_unification_responses, make_question_str
 from src.data_models.QuestionDetails import QuestionDetails
 from src.data_models.CompletionResponse import CompletionResponse
 
@@ -72,3 +73,30 @@ class TestDetailsPreparation:
         assert "Unified Background" in details_str
         assert "Unified Criteria" in details_str
         assert "Unified Fine Print" in details_str
+
+    @patch('src.data_models.DetailsPreparation.gather_predictions')
+    def test_afetch_detail_unification_responses(self, mock_gather_predictions):
+        single_question_prep = DetailsPreparation(question_ids=[1], question_details_dict=self.mock_question_details)
+        mock_response = MagicMock(spec=CompletionResponse)
+        mock_response.content = '{"title": "Unified Title", "background": "Unified Background", "resolution_criteria": "Unified Criteria", "fine_print": "Unified Fine Print"}'
+        mock_gather_predictions.return_value = [mock_response]
+
+        asyncio.run(afetch_detail_unification_responses([single_question_prep, self.details_preparation]))
+
+        assert len(mock_gather_predictions.call_args.args[0]) == 1
+        assert self.details_preparation.unification_response is mock_response
+        assert self.details_preparation.unified_details['title'] == 'Unified Title'
+        assert single_question_prep.unified_details == self.mock_question_details[1].details_dict
+
+    def test_make_question_str_omits_empty_fields(self):
+        question_details = QuestionDetails({
+            'id': 3,
+            'title': 'Question 3',
+            'resolution_criteria': 'Criteria 3',
+            'fine_print': '',
+            'description': 'Description 3',
+            'publish_time': '2023-08-20T00:00:00'
+        })
+        assert make_question_str(question_details) == \
+            "[Q3] title=Question 3; pub=2023-08-20; rc=Criteria 3; bg=Description 3"
+
@@ -0,0 +1,179 @@
+import httpx
+import openai
+import pytest
+from unittest.mock import patch, MagicMock
+from langchain_core.runnables import RunnableLambda
+from src.data_models.HtmlContentProcessor import (HtmlContentProcessor, MAX_RESPONSE_TOKENS,
+                                                  _invoke_with_retry, _is_transient_llm_error)
+from src.data_models.DetailsPreparation import DetailsPreparation
+from src.data_models.QuestionDetails import QuestionDetails
+from src.data_models.SemanticResponseCache import SemanticResponseCache
+
+class TestHtmlContentProcessor:
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.mock_question_details = {
+            1: QuestionDetails({
+                'id': 1,
+                'title': 'Question 1',
+                'resolution_criteria': 'Criteria 1',
+                'fine_print': 'Fine print 1',
+                'description': 'See https://example.com/a and https://example.com/b',
+                'publish_time': '2023-08-18T00:00:00'
+            }),
+        }
+        self.mock_details_preparation = MagicMock(spec=DetailsPreparation)
+        self.mock_details_preparation.make_details_str.return_value = "Details about the question"
+        self.mock_details_preparation.question_details_dict = self.mock_question_details
+        self.processor = HtmlContentProcessor(self.mock_details_preparation)
+
+    def test_extract_urls_from_backgrounds(self):
+        urls = self.processor.extract_urls_from_backgrounds()
+        assert urls == ['https://example.com/a', 'https://example.com/b']
+
+    @patch('src.data_models.HtmlContentProcessor.fetch_html')
+    def test_run_skips_urls_that_fail(self, mock_fetch_html):
+        def fake_fetch_html(url):
+            if url.endswith("b"):
+                raise Exception("Connection error")
+            return "<html><body><p>Some text</p></body></html>"
+        mock_fetch_html.side_effect = fake_fetch_html
+        mock_chain = MagicMock()
+        mock_chain.batch.return_value = ["- A fact"]
+
+        with patch.object(HtmlContentProcessor, '_make_chain', return_value=mock_chain):
+            self.processor.run()
+
+        assert self.processor.llm_responses == {'https://example.com/a': "- A fact"}
+        input_dicts = mock_chain.batch.call_args.args[0]
+        assert [d["scraped_text"] for d in input_dicts] == ["Some text"]
+
+    @patch('src.data_models.HtmlContentProcessor.fetch_html')
+    def test_run_reuses_response_for_duplicated_content(self, mock_fetch_html):
+        mock_fetch_html.return_value = "<html><body><p>The same article, published on 2023-08-18</p></body></html>"
+        mock_chain = MagicMock()
+        mock_chain.batch.return_value = ["- A fact"]
+
+        with patch.object(HtmlContentProcessor, '_make_chain', return_value=mock_chain):
+            self.processor.run()
+
+        assert len(mock_chain.batch.call_args.args[0]) == 1
+        assert self.processor.llm_responses == {'https://example.com/a': "- A fact",
+                                                'https://example.com/b': "- A fact"}
+        assert self.processor.collapse_responses_in_single_str() == \
+            "Information extracted from https://example.com/a, https://example.com/b:\n- A fact"
+
+    @patch('src.data_models.HtmlContentProcessor.COMPRESSED_TEXT_MAX_TOKENS', 10)
+    @patch('src.data_models.HtmlContentProcessor.fetch_html')
+    def test_fetch_and_clean_urls_compresses_long_texts(self, mock_fetch_html):
+        mock_fetch_html.return_value = ("<html><body><p>Unrelated navigation menu.</p>"
+                                        "<p>Resolution criteria 1 was met.</p>"
+                                        "<p>Footer with links.</p></body></html>")
+        scraped_texts = self.processor.fetch_and_clean_urls(['https://example.com/a'])
+        assert scraped_texts == {'https://example.com/a': "Resolution criteria 1 was met."}
+
+    def test_deduplicate_texts_keeps_texts_with_different_figures(self):
+        texts = {'https://example.com/a': "Inflation 2024: 211%",
+                 'https://example.com/b': "Inflation 2023: 94%"}
+        unique_texts, duplicated_urls = self.processor.deduplicate_texts(texts)
+        assert unique_texts == texts
+        assert duplicated_urls == {}
+
+    def test_deduplicate_texts_keeps_different_texts(self):
+        texts = {'https://example.com/a': "Inflation in Argentina reached a new record this month",
+                 'https://example.com/b': "The football team won the championship after a long season"}
+        unique_texts, duplicated_urls = self.processor.deduplicate_texts(texts)
+        assert unique_texts == texts
+        assert duplicated_urls == {}
+
+    @patch('src.data_models.HtmlContentProcessor.llm_smart_cached')
+    @patch('src.data_models.HtmlContentProcessor.llm_cheap_cached')
+    def test_make_chain_caps_the_response_tokens(self, mock_llm_cheap, mock_llm_smart):
+        self.processor._make_chain()
+
+        mock_llm_cheap.bind.assert_called_once_with(max_tokens=MAX_RESPONSE_TOKENS)
+        mock_llm_smart.bind.assert_called_once_with(max_tokens=MAX_RESPONSE_TOKENS)
+
+    @patch('src.data_models.HtmlContentProcessor.llm_smart_cached')
+    @patch('src.data_models.HtmlContentProcessor.llm_cheap_cached')
+    def test_make_chain_retries_transient_errors(self, mock_llm_cheap, mock_llm_smart):
+        request = httpx.Request("POST", "https://proxy.example.com")
+        errors = [openai.RateLimitError("rate limited", response=httpx.Response(429, request=request), body=None)]
+
+        def fake_llm(prompt):
+            if errors:
+                raise errors.pop()
+            return "- A fact"
+        mock_llm_cheap.bind.return_value = RunnableLambda(fake_llm)
+
+        with patch.object(_invoke_with_retry.retry, 'sleep'):
+            response = self.processor._make_chain().invoke(self.processor._make_input_dict("text a", 'https://example.com/a'))
+
+        assert response == "- A fact"
+
+    @patch('src.data_models.HtmlContentProcessor.get_encoding', return_value=None)
+    def test_make_input_dict_truncates_texts_over_budget(self, mock_get_encoding):
+        self.processor.scraped_text_max_tokens = 5
+        assert self.processor._make_input_dict("short", 'https://example.com/a')["scraped_text"] == "short"
+        mock_get_encoding.assert_not_called()
+        long_text = "word " * 100
+        truncated_text = self.processor._make_input_dict(long_text, 'https://example.com/a')["scraped_text"]
+        assert long_text.startswith(truncated_text)
+        assert 0 < len(truncated_text.encode()) <= 5
+
+    def test_apply_llm_to_texts_drops_failed_calls(self):
+        mock_chain = MagicMock()
+        mock_chain.batch.return_value = ["- A fact", Exception("Rate limit")]
+
+        with patch.object(HtmlContentProcessor, '_make_chain', return_value=mock_chain):
+            responses = self.processor.apply_llm_to_texts({'https://example.com/a': "text a",
+                                                           'https://example.com/b': "text b"})
+
+        assert responses == {'https://example.com/a': "- A fact"}
+
+    def test_apply_llm_to_texts_uses_semantic_cache(self):
+        mock_semantic_cache = MagicMock(spec=SemanticResponseCache)
+        mock_semantic_cache.lookup.return_value = {'https://example.com/a': "- A cached fact"}
+        processor = HtmlContentProcessor(self.mock_details_preparation, semantic_cache=mock_semantic_cache)
+        mock_chain = MagicMock()
+        mock_chain.batch.return_value = ["- A new fact"]
+        texts = {'https://example.com/a': "text a", 'https://example.com/b': "text b"}
+
+        with patch.object(HtmlContentProcessor, '_make_chain', return_value=mock_chain):
+            responses = processor.apply_llm_to_texts(texts)
+
+        assert responses == {'https://example.com/a': "- A cached fact",
+                             'https://example.com/b': "- A new fact"}
+        assert [d["url"] for d in mock_chain.batch.call_args.args[0]] == ['https://example.com/b']
+        mock_semantic_cache.update.assert_called_once_with(
+            texts, {'https://example.com/b': "- A new fact"}, context="Details about the question")
+
+    def test_collapse_responses_in_single_str(self):
+        self.processor.llm_responses = {'https://example.com/a': "- A fact",
+                                        'https://example.com/b': "- Another fact"}
+        collapsed = self.processor.collapse_responses_in_single_str()
+        assert collapsed == ("Information extracted from https://example.com/a:\n- A fact\n\n"
+                             "Information extracted from https://example.com/b:\n- Another fact")
+
+
+REQUEST = httpx.Request("POST", "https://proxy.example.com")
+
+
+def make_connection_error(error_class, cause):
+    try:
+        raise error_class(request=REQUEST) from cause
+    except openai.APIConnectionError as e:
+        return e
+
+
+@pytest.mark.parametrize("exception, retried", [
+    (openai.RateLimitError("error", response=httpx.Response(429, request=REQUEST), body=None), True),
+    (openai.InternalServerError("error", response=httpx.Response(503, request=REQUEST), body=None), True),
+    (openai.InternalServerError("error", response=httpx.Response(504, request=REQUEST), body=None), False),
+    (make_connection_error(openai.APIConnectionError, httpx.ConnectError("connection refused")), True),
+    (make_connection_error(openai.APIConnectionError, httpx.ReadError("connection reset")), False),
+    (make_connection_error(openai.APITimeoutError, httpx.ReadTimeout("timed out")), False),
+], ids=["429", "503", "504", "connect_error", "read_error", "read_timeout"])
+def test_is_transient_llm_error(exception, retried):
+    assert _is_transient_llm_error(exception) is retried
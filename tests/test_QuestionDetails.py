@@ -1,46 +1,74 @@
+from __future__ import annotations
+
 import pytest
+import re
+import types
 from datetime import datetime
+from typing import Final
 from src.data_models.QuestionDetails import QuestionDetails
 
+pytestmark = pytest.mark.unit
+
+REQUIRED_KEYS = ['id', 'title', 'resolution_criteria', 'fine_print', 'description', 'publish_time']
+
+_PUBLISH_TIME: Final[str] = '2021-12-13T14:15:16'
+
+_BASE = types.MappingProxyType({
+    'id': 1,
+    'title': 'Test Title',
+    'resolution_criteria': 'Test Resolution Criteria',
+    'fine_print': 'Test Fine Print',
+    'description': 'Test Description',
+    'publish_time': _PUBLISH_TIME
+})
+
+_VALID = types.MappingProxyType({**_BASE, 'publish_time': '2021-10-10T10:10:10'})
+_EXPECTED_PUBLISH_TIME = datetime(2021, 10, 10, 10, 10, 10)
+_EXPECTED_PUBLISH_DATE = '2021-10-10'
+
+
+# Each case is (id, details_dict, missing_key); valid dicts have no missing key.
+# The dicts are shared by every run of the test, so they are read-only too.
+CASES = [
+    ('valid', _VALID, None),
+    *[(f'missing_{key}', types.MappingProxyType({k: v for k, v in _BASE.items() if k != key}), key)
+      for key in REQUIRED_KEYS],
+]
+
+
+PROPERTIES = [
+    ('id', 1),
+    ('title', 'Test Title'),
+    ('resolution_criteria', 'Test Resolution Criteria'),
+    ('fine_print', 'Test Fine Print'),
+    ('background', 'Test Description'),
+    ('publish_time', _EXPECTED_PUBLISH_TIME),
+    ('publish_date', _EXPECTED_PUBLISH_DATE),
+]
+
+
+@pytest.fixture(scope="session")
+def details():
+    # Safe to share: the properties of QuestionDetails are read-only.
+    return QuestionDetails(_VALID)
 
 
 # Tests for the QuestionDetails class:
 class TestQuestionDetails:
-    details_dict_example = {
-            'id': 1,
-            'title': 'Test Title',
-            'resolution_criteria': 'Test Resolution Criteria',
-            'fine_print': 'Test Fine Print',
-            'description': 'Test Description',
-            'publish_time': '2021-12-13T14:15:16'
-        }
-    
-    def test_properties(self):
-        details_dict = {
-            'id': 1,
-            'title': 'Test Title',
-            'resolution_criteria': 'Test Resolution Criteria',
-            'fine_print': 'Test Fine Print',
-            'description': 'Test Description',
-            'publish_time': '2021-10-10T10:10:10'
-        }
-        details = QuestionDetails(details_dict)
-        assert details.id == 1
-        assert details.title == 'Test Title'
-        assert details.resolution_criteria == 'Test Resolution Criteria'
-        assert details.fine_print == 'Test Fine Print'
-        assert details.background == 'Test Description'
-        assert details.publish_time == datetime(2021, 10, 10, 10, 10, 10)
-        assert details.publish_date == '2021-10-10'
-    
-    def remove_key(self, dictionary, key):
-        new_dict = dictionary.copy()
-        del new_dict[key]
-        return new_dict
-    
-    def test_fail_if_missing_key(self):
-        """The class should not be able to be instantiated if a required key is missing."""
-        for key in ['id', 'title', 'resolution_criteria', 'fine_print', 'description', 'publish_time']:
-            details_dict = self.remove_key(self.details_dict_example, key)
-            with pytest.raises(ValueError):
-                QuestionDetails(details_dict)
\ No newline at end of file
+
+    @pytest.mark.parametrize("details_dict, missing_key",
+                             [case[1:] for case in CASES],
+                             ids=[case[0] for case in CASES])
+    def test_construction(self, details_dict, missing_key):
+        """The class can't be instantiated if a required key is missing."""
+        if missing_key is not None:
+            with pytest.raises(ValueError, match=re.escape(f"'{missing_key}'")):
+                QuestionDetails(details_dict)
+            return
+        assert QuestionDetails(details_dict).id == details_dict['id']
+
+    @pytest.mark.parametrize("property_name, expected",
+                             PROPERTIES,
+                             ids=[property_name for property_name, _ in PROPERTIES])
+    def test_properties(self, details, property_name, expected):
+        assert getattr(details, property_name) == expected
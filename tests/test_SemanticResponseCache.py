@@ -0,0 +1,37 @@
+import pytest
+from unittest.mock import patch
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.data_models.SemanticResponseCache import SemanticResponseCache
+
+BOILERPLATE = "Home | News | Sports | Weather | Contact. " * 100
+
+
+class TestSemanticResponseCache:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path):
+        with patch('src.data_models.SemanticResponseCache.DATA_DIR', str(tmp_path)), \
+             patch('src.data_models.SemanticResponseCache.OpenAIEmbeddings',
+                   return_value=DeterministicFakeEmbedding(size=16)):
+            self.cache = SemanticResponseCache()
+            assert not (tmp_path / "chroma_langchain_db").exists()
+            self.cache.update({'https://example.com/a': BOILERPLATE + "The election is in November."},
+                              {'https://example.com/a': "- The election is in November"},
+                              context="Question details")
+            assert (tmp_path / "chroma_langchain_db").exists()
+            yield
+
+    def test_lookup_hits_the_same_text(self):
+        responses = self.cache.lookup({'https://example.com/b': BOILERPLATE + "The election is in November."},
+                                      context="Question details")
+        assert responses == {'https://example.com/b': "- The election is in November"}
+
+    def test_lookup_misses_a_different_text_with_the_same_beginning(self):
+        responses = self.cache.lookup({'https://example.com/b': BOILERPLATE + "The team won the championship."},
+                                      context="Question details")
+        assert responses == {}
+
+    def test_lookup_misses_a_different_context(self):
+        responses = self.cache.lookup({'https://example.com/b': BOILERPLATE + "The election is in November."},
+                                      context="Other question details")
+        assert responses == {}
@@ -0,0 +1,73 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from src.data_models.VectorStoreManager import VectorStoreManager
+from src.data_models.QuestionDetails import QuestionDetails
+
+
+def make_question_dict(question_id):
+    return {
+        'id': question_id,
+        'title': f'Question {question_id}',
+        'resolution_criteria': 'Criteria',
+        'fine_print': 'Fine print',
+        'description': 'Description',
+        'publish_time': '2023-08-18T00:00:00',
+        'close_time': '2023-09-18T00:00:00',
+    }
+
+
+class TestVectorStoreManager:
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        with patch('src.data_models.VectorStoreManager.chromadb.PersistentClient'), \
+             patch('src.data_models.VectorStoreManager.OpenAIEmbeddings'):
+            self.vector_store_manager = VectorStoreManager()
+        self.vector_store_manager.vector_store = MagicMock()
+        self.stored_ids = {"1"}
+        self.vector_store_manager.vector_store.get.side_effect = \
+            lambda ids, **kwargs: {"ids": [i for i in ids if i in self.stored_ids]}
+        self.pages = [
+            {"results": [make_question_dict(3), make_question_dict(2)]},
+            {"results": [make_question_dict(1)]},
+            {"results": []},
+        ]
+
+    def fake_list_questions(self, offset, **kwargs):
+        page_index = offset // 100
+        return self.pages[page_index] if page_index < len(self.pages) else {"results": []}
+
+    @patch('src.data_models.VectorStoreManager.list_questions')
+    def test_update_store_adds_only_new_questions(self, mock_list_questions):
+        mock_list_questions.side_effect = self.fake_list_questions
+
+        self.vector_store_manager.update_store()
+
+        self.vector_store_manager.vector_store.add_documents.assert_called_once()
+        added_documents = self.vector_store_manager.vector_store.add_documents.call_args.args[0]
+        assert sorted(doc.metadata["question_id"] for doc in added_documents) == [2, 3]
+
+    @patch('src.data_models.VectorStoreManager.list_questions')
+    def test_update_store_stops_at_empty_page(self, mock_list_questions):
+        self.stored_ids = set()
+        mock_list_questions.side_effect = self.fake_list_questions
+
+        self.vector_store_manager.update_store()
+
+        added_documents = self.vector_store_manager.vector_store.add_documents.call_args.args[0]
+        assert [doc.metadata["question_id"] for doc in added_documents] == [3, 2, 1]
+
+    def test_metadata_from_question_details(self):
+        metadata = self.vector_store_manager._metadata_from_question_details(
+            QuestionDetails(make_question_dict(1)))
+        assert metadata["question_id"] == 1
+        assert metadata["publish_date"] == '2023-08-18'
+        assert metadata["close_date"] == '2023-09-18'
+        assert metadata["resolve_timestamp"] is None
+
+    def test_metadata_timestamps_do_not_depend_on_created_time(self):
+        details_dict = {**make_question_dict(1), 'created_time': '2023-08-01T00:00:00'}
+        metadata = self.vector_store_manager._metadata_from_question_details(QuestionDetails(details_dict))
+        assert metadata["created_timestamp"] is not None
+        assert metadata["close_timestamp"] is not None
+        assert metadata["resolve_timestamp"] is None
@@ -0,0 +1,43 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from src.html_utils import compress_text, extract_keywords, _get_session
+
+pytestmark = pytest.mark.unit
+
+
+class TestCompressText:
+
+    def test_keeps_the_most_relevant_sentences_in_order(self):
+        text = "The election is in November. Cats are nice. Polls favor the incumbent in the election."
+        keywords = extract_keywords("Who will win the election? Check the polls.")
+
+        assert compress_text(text, keywords, max_chars=75) == (
+            "The election is in November.\nPolls favor the incumbent in the election.")
+
+    def test_returns_short_texts_unchanged(self):
+        assert compress_text("Short text. Another one.", {"short"}, max_chars=100) == "Short text. Another one."
+
+    def test_splits_sentences_longer_than_the_budget(self):
+        compressed = compress_text("question " + "a" * 50000, {"question"}, max_chars=32000)
+
+        assert 0 < len(compressed) <= 32000
+        assert compressed.startswith("question ")
+
+
+class TestGetSession:
+
+    def test_creates_the_cache_on_first_use(self, tmp_path):
+        cache_path = tmp_path / "data" / "http_cache.sqlite"
+        with patch('src.html_utils._session', None), patch('src.html_utils.HTTP_CACHE_PATH', str(cache_path)):
+            assert _get_session() is _get_session()
+        assert cache_path.exists()
+
+    def test_concurrent_first_calls_share_one_session(self, tmp_path):
+        cache_path = tmp_path / "data" / "http_cache.sqlite"
+        with patch('src.html_utils._session', None), patch('src.html_utils.HTTP_CACHE_PATH', str(cache_path)), \
+                patch('src.html_utils.CachedSession', side_effect=lambda **kwargs: object()) as session_cls:
+            with ThreadPoolExecutor(max_workers=10) as executor:
+                sessions = list(executor.map(lambda _: _get_session(), range(10)))
+        assert session_cls.call_count == 1
+        assert all(session is sessions[0] for session in sessions)
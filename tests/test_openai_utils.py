@@ -0,0 +1,131 @@
+import asyncio
+import httpx
+import pytest
+import orjson
+from unittest.mock import patch
+from typing import Any
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.outputs import ChatResult, Generation, LLMResult
+import src.config  # src.config and src.openai_utils import each other, so src.config has to be loaded first
+from src.data_models.CompletionResponse import CompletionResponse
+from src.openai_utils import (BudgetCallbackHandler, LazySQLiteCache, gather_predictions, get_gpt_prediction_via_proxy,
+                              close,
+                              _SESSION, _is_transient_error)
+
+
+class FakeBillingChatModel(FakeListChatModel):
+    """Fake chat model that reports the token usage of each call, like ChatOpenAI does."""
+
+    def _generate(self, *args: Any, **kwargs: Any) -> ChatResult:
+        result = super()._generate(*args, **kwargs)
+        result.llm_output = {"model_name": "gpt-4o",
+                             "token_usage": {"prompt_tokens": 1000, "completion_tokens": 100, "total_tokens": 1100}}
+        return result
+
+
+class TestBudgetCallbackHandler:
+
+    def make_llm_result(self, prompt_tokens, completion_tokens):
+        return LLMResult(generations=[], llm_output={
+            "model_name": "gpt-4o",
+            "token_usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    def test_tracks_cost_under_budget(self):
+        budget_callback = BudgetCallbackHandler(budget_usd=1.0)
+        budget_callback.on_llm_end(self.make_llm_result(1000, 100))
+
+        assert budget_callback.total_tokens == 1100
+        assert 0 < budget_callback.total_cost < 1.0
+        assert not budget_callback.budget_exceeded
+        budget_callback.on_llm_start({}, ["prompt"])
+
+    def test_refuses_new_calls_once_budget_is_exceeded(self):
+        budget_callback = BudgetCallbackHandler(budget_usd=0.001)
+
+        budget_callback.on_llm_end(self.make_llm_result(1000, 100))
+        assert budget_callback.budget_exceeded
+        with pytest.raises(RuntimeError):
+            budget_callback.on_llm_start({}, ["prompt"])
+
+    def test_call_crossing_the_budget_still_returns_its_result(self):
+        llm = FakeBillingChatModel(responses=["ok", "not reached"])
+        budget_callback = BudgetCallbackHandler(budget_usd=0.001)
+
+        assert llm.invoke("prompt", config={"callbacks": [budget_callback]}).content == "ok"
+        assert budget_callback.budget_exceeded
+        with pytest.raises(RuntimeError):
+            llm.invoke("prompt", config={"callbacks": [budget_callback]})
+
+
+class TestLazySQLiteCache:
+
+    def test_creates_the_database_on_first_use(self, tmp_path):
+        database_path = tmp_path / "data" / "cache.db"
+        cache = LazySQLiteCache(database_path=str(database_path))
+        assert not database_path.parent.exists()
+
+        cache.update("prompt", "llm", [Generation(text="42")])
+
+        assert database_path.exists()
+        assert cache.lookup("prompt", "llm") == [Generation(text="42")]
+
+
+class TestGetGptPredictionViaProxy:
+
+    def teardown_method(self):
+        close()
+
+    @patch('src.openai_utils.METACULUS_OPENAI_PROXY_URL', "https://proxy.example.com")
+    @patch('src.openai_utils._SESSION')
+    def test_posts_through_the_shared_session(self, mock_session):
+        mock_session.post.return_value.json.return_value = {"choices": [{"message": {"content": "42"}}]}
+        messages = [{"role": "user", "content": "question"}]
+
+        response = get_gpt_prediction_via_proxy(messages, model="gpt-4o")
+
+        assert response.content == "42"
+        assert orjson.loads(mock_session.post.call_args.kwargs["data"]) == {"model": "gpt-4o", "messages": messages}
+
+    def test_does_not_retry_read_errors(self):
+        # The request may have been processed (and billed) already, so it must not be sent again.
+        max_retries = _SESSION.get_adapter("https://proxy.example.com").max_retries
+        assert max_retries.read == 0
+        assert set(max_retries.status_forcelist) == {429, 503}
+        assert not _is_transient_error(httpx.ReadTimeout("timed out"))
+        assert _is_transient_error(httpx.ConnectError("connection refused"))
+
+    @pytest.mark.parametrize("status_code, retried", [(429, True), (503, True), (500, False), (502, False), (504, False)])
+    def test_retries_only_statuses_sent_before_processing(self, status_code, retried):
+        request = httpx.Request("POST", "https://proxy.example.com")
+        error = httpx.HTTPStatusError("error", request=request, response=httpx.Response(status_code, request=request))
+        assert _is_transient_error(error) is retried
+
+
+class TestGatherPredictions:
+
+    def make_client(self, max_connections=8):
+        def handler(request):
+            content = request.read().decode()
+            if "fail" in content:
+                return httpx.Response(400, request=request)
+            return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    @patch('src.openai_utils.METACULUS_OPENAI_PROXY_URL', "https://proxy.example.com")
+    def test_returns_responses_in_order_and_failures_as_exceptions(self):
+        list_of_messages = [[{"role": "user", "content": "first"}],
+                            [{"role": "user", "content": "fail"}],
+                            [{"role": "user", "content": "third"}]]
+
+        with patch('src.openai_utils._make_async_client', side_effect=self.make_client):
+            responses = asyncio.run(gather_predictions(list_of_messages, max_concurrency=2))
+
+        assert isinstance(responses[0], CompletionResponse)
+        assert "first" in responses[0].content
+        assert isinstance(responses[1], httpx.HTTPStatusError)
+        assert "third" in responses[2].content
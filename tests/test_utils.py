@@ -0,0 +1,39 @@
+import pytest
+from src.utils import try_to_parse_json, try_to_find_and_eval_dict, parse_json_projected
+
+pytestmark = pytest.mark.unit
+
+
+class TestJsonParsing:
+
+    def test_try_to_parse_json_strips_backticks(self):
+        s = 'Here is the answer:\n```json\n{"a": 1, "b": [2, 3]}\n```'
+        assert try_to_parse_json(s) == {"a": 1, "b": [2, 3]}
+
+    def test_try_to_parse_json_removes_control_characters(self):
+        s = '{"a": "line\x01 break"}'
+        assert try_to_parse_json(s) == {"a": "line break"}
+
+    def test_try_to_find_and_eval_dict(self):
+        s = 'Sure! {"group_1": [1, 2], "group_2": [3]} Hope it helps.'
+        assert try_to_find_and_eval_dict(s) == {"group_1": [1, 2], "group_2": [3]}
+
+    def test_try_to_find_and_eval_dict_accepts_python_literals(self):
+        s = "{'group_1': [1, 2], 'group_2': [3]}"
+        assert try_to_find_and_eval_dict(s) == {"group_1": [1, 2], "group_2": [3]}
+
+    def test_try_to_find_and_eval_dict_does_not_evaluate_code(self):
+        with pytest.raises(ValueError):
+            try_to_find_and_eval_dict('{__import__("os").getcwd(): 1}')
+
+    def test_parse_json_projected_keeps_only_requested_keys(self):
+        s = '```json\n{"title": "T", "extra": {"nested": [1, 2]}, "groups": {"a": [1, {"b": 2}]}}\n```'
+        assert parse_json_projected(s, ["title", "groups", "missing"]) == {"title": "T", "groups": {"a": [1, {"b": 2}]}}
+
+    def test_parse_json_projected_raises_value_error(self):
+        with pytest.raises(ValueError):
+            parse_json_projected('{"title": }', ["title"])
+
+    def test_parse_json_projected_accepts_python_literals(self):
+        s = "{'title': 'T', 'extra': None, 'groups': {'a': [1, 2]}}"
+        assert parse_json_projected(s, ["title", "groups"]) == {"title": "T", "groups": {"a": [1, 2]}}